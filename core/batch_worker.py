@@ -1,52 +1,261 @@
 # core/batch_worker.py
 import concurrent.futures
-import pathlib
-from core.exporter import compose_watermark_on_image
+from concurrent.futures.process import BrokenProcessPool
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from PIL import Image
+from core.exporter import compose_watermark_on_image, prepare_watermark
+from core.watermark import create_text_watermark_image_cached
 
-def ensure_output_path(src_path, out_dir, prefix='', suffix='', keep_name=True):
-    src = pathlib.Path(src_path)
-    if keep_name:
-        name = src.stem
-    else:
-        name = src.stem
-    new_name = f"{prefix}{name}{suffix}{src.suffix}"
-    dst = pathlib.Path(out_dir) / new_name
+# 编码参数预设，可直接合并进任务 dict：
+# fast 为默认，编码最快（不做 Huffman 二次优化、PNG 最低压缩级别）；
+# balanced 开启优化，体积更小；best 不做色度抽样（4:4:4），画质最好但文件更大、编码最慢
+SAVE_PRESETS = {
+    'fast': {'jpeg_optimize': False, 'jpeg_progressive': False, 'jpeg_subsampling': 2, 'png_compress_level': 1},
+    'balanced': {'jpeg_optimize': True, 'jpeg_progressive': False, 'jpeg_subsampling': 2, 'png_compress_level': 6},
+    'best': {'jpeg_optimize': True, 'jpeg_progressive': True, 'jpeg_subsampling': 0, 'png_compress_level': 9},
+}
+
+# 每个 worker 平均至少分到这么多张图时才使用进程池；更小的批次（包括最常见的单张导出）
+# 用线程完成，省去进程启动与水印传输的开销
+PROCESS_MIN_TASKS_PER_WORKER = 2
+
+# 子进程内的水印图缓存: {水印文件路径: (PIL.Image, prepare_watermark 结果)}，只保留当前批次的水印
+_WORKER_WATERMARKS = {}
+_worker_batch_dir = None
+
+# 进程池在多次导出之间复用（见 get_process_pool），只在第一次需要时启动子进程
+_pool_lock = threading.Lock()
+_process_pool = None  # (max_workers, ProcessPoolExecutor)
+
+def list_existing_names(out_dir):
+    """扫描一次输出目录，返回已存在文件名的集合（按平台规则归一化大小写）"""
+    return {os.path.normcase(n) for n in os.listdir(out_dir)}
+
+def output_ext(output_format):
+    """输出格式对应的文件扩展名"""
+    return '.jpg' if output_format.lower() in ('jpg', 'jpeg') else '.png'
+
+def ensure_output_path(src_path, out_dir, prefix='', suffix='', keep_name=True, existing=None, ext=None):
+    """
+    existing: list_existing_names 得到的集合；批量调用时传入同一个 set，
+              只需扫描一次目录，且已分配的文件名会加入集合，避免同一批次内重名
+    ext: 输出文件扩展名（如 '.jpg'），默认沿用源文件的扩展名
+    """
+    # 文件名各部分只拆分一次，循环内只做字符串拼接与集合查找
+    name, src_ext = os.path.splitext(os.path.basename(src_path))
+    if ext is None:
+        ext = src_ext
+    base = f"{prefix}{name}{suffix}"
+    if existing is None:
+        existing = list_existing_names(out_dir)
+    new_name = f"{base}{ext}"
     # 如果文件存在，追加序号
     i = 1
-    while dst.exists():
-        dst = pathlib.Path(out_dir) / f"{prefix}{name}{suffix}_{i}{src.suffix}"
+    while os.path.normcase(new_name) in existing:
+        new_name = f"{base}_{i}{ext}"
         i += 1
-    return str(dst)
+    existing.add(os.path.normcase(new_name))
+    return os.path.join(out_dir, new_name)
 
-def batch_export(tasks, max_workers=2, progress_callback=None):
+def _write_watermark(img, batch_dir, index):
+    """
+    把水印的原始像素写入批次临时目录，返回 (文件路径, mode, size)。
+    任务中只携带这个小元组，每个子进程第一次用到时读取一次（通常直接命中页缓存），
+    不必随每个任务块 pickle 一份像素数据
+    """
+    path = os.path.join(batch_dir, f"wm{index}.raw")
+    with open(path, 'wb') as f:
+        f.write(img.tobytes())
+    return path, img.mode, img.size
+
+def _load_worker_watermark(ref):
+    """子进程内按 _write_watermark 的结果取水印图，每个进程每个水印只读取、拆分一次"""
+    global _worker_batch_dir
+    path, mode, size = ref
+    batch_dir = os.path.dirname(path)
+    if batch_dir != _worker_batch_dir:
+        # 新的一批导出：丢弃上一批的水印，进程复用时内存不会累积
+        _WORKER_WATERMARKS.clear()
+        _worker_batch_dir = batch_dir
+    cached = _WORKER_WATERMARKS.get(path)
+    if cached is None:
+        with open(path, 'rb') as f:
+            img = Image.frombytes(mode, size, f.read())
+        cached = _WORKER_WATERMARKS[path] = (img, prepare_watermark(img))
+    return cached
+
+def get_process_pool(max_workers):
+    """
+    返回在多次导出之间复用的进程池；并发数变化或进程池损坏后重新创建。
+    子进程用 spawn 方式启动：GUI 进程里有多个线程，fork 出的子进程可能继承被其他线程持有的锁而死锁
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None and _process_pool[0] != max_workers:
+            _process_pool[1].shutdown(wait=False)
+            _process_pool = None
+        if _process_pool is None:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            _process_pool = (max_workers, executor)
+        return _process_pool[1]
+
+def shutdown_process_pool():
+    """关闭复用的进程池（程序退出时调用）"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool[1].shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+def _discard_process_pool(executor):
+    """进程池损坏（子进程异常退出）后丢弃，下次导出时重新创建"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None and _process_pool[1] is executor:
+            _process_pool = None
+
+def _export_one(task):
+    """
+    导出单个任务，返回 (success, message)：成功时 message 为输出路径，
+    失败时为 "源文件名: 错误信息"，批量导出时能看出是哪张图片出错；
+    需为模块级函数以便进程池 pickle
+    """
+    try:
+        prepared = task.get('watermark_prepared')
+        if 'watermark_img' in task:
+            watermark_img = task['watermark_img']
+            if not isinstance(watermark_img, Image.Image):
+                watermark_img, prepared = _load_worker_watermark(watermark_img)
+        else:
+            # 只给了渲染参数：每个 worker 对相同参数只渲染一次，之后命中缓存
+            watermark_img = create_text_watermark_image_cached(**task['watermark_params'])
+        compose_watermark_on_image(
+            task['src_path'],
+            task['dst_path'],
+            watermark_img=watermark_img,
+            anchor=task.get('anchor', (0.5,0.5)),
+            output_format=task.get('output_format','png'),
+            jpeg_quality=task.get('jpeg_quality',90),
+            resize_to=task.get('resize_to', None),
+            optimize=task.get('jpeg_optimize', False),
+            progressive=task.get('jpeg_progressive', False),
+            subsampling=task.get('jpeg_subsampling', -1),
+            compress_level=task.get('png_compress_level', 1),
+            prepared=prepared
+        )
+        return True, task['dst_path']
+    except Exception as e:
+        return False, f"{os.path.basename(task['src_path'])}: {e}"
+
+def _export_chunk(chunk):
+    """在同一个 worker 中顺序导出一组任务，减少 future 创建与进程间往返次数"""
+    return [_export_one(t) for t in chunk]
+
+def default_max_workers():
+    """默认并发数：CPU 核数（上限 32），可用环境变量 WATERMARKER_MAX_WORKERS 覆盖"""
+    env = os.environ.get('WATERMARKER_MAX_WORKERS')
+    if env and env.isdigit() and int(env) > 0:
+        return int(env)
+    return min(32, os.cpu_count() or 4)
+
+def batch_export(tasks, max_workers=None, progress_callback=None, use_processes=None):
     """
     tasks: list of dicts, 每个 dict 包含 src_path, dst_path, watermark_img(pil), anchor, output_format, jpeg_quality, resize_to
+           以及可选的编码参数 jpeg_optimize, jpeg_progressive, jpeg_subsampling, png_compress_level（见 SAVE_PRESETS）
+           也可以不传 dst_path，改传 out_dir（以及可选的 prefix, suffix），由 ensure_output_path 分配不重名的输出路径
+           水印相同的一批任务也可以不传 watermark_img，改传 watermark_params（create_text_watermark_image 的参数），
+           由 worker 通过 create_text_watermark_image_cached 渲染并复用
+    max_workers: 并发数，默认见 default_max_workers()
     progress_callback(idx, total, success, message)
+    use_processes: True 时使用进程池（合成/编码为 CPU 密集型，可利用多核）；False 时使用线程池；
+                   默认 None 按批次大小决定：平均每个 worker 不足 PROCESS_MIN_TASKS_PER_WORKER 张时用线程
     """
     results = []
     total = len(tasks)
-    def worker(task):
-        try:
-            compose_watermark_on_image(
-                task['src_path'],
-                task['dst_path'],
-                watermark_img=task['watermark_img'],
-                anchor=task.get('anchor', (0.5,0.5)),
-                output_format=task.get('output_format','png'),
-                jpeg_quality=task.get('jpeg_quality',90),
-                resize_to=task.get('resize_to', None)
-            )
-            return True, ''
-        except Exception as e:
-            return False, str(e)
+    if not total:
+        return results
+
+    # 未给出 dst_path 的任务在派发前统一分配文件名：每个输出目录只扫描一次，
+    # 且都在当前线程完成，worker 之间无需加锁
+    existing_by_dir = {}
+    resolved = []
+    for t in tasks:
+        if 'dst_path' not in t:
+            out_dir = t['out_dir']
+            if out_dir not in existing_by_dir:
+                existing_by_dir[out_dir] = list_existing_names(out_dir)
+            t = {**t, 'dst_path': ensure_output_path(
+                t['src_path'], out_dir, t.get('prefix', ''), t.get('suffix', ''),
+                existing=existing_by_dir[out_dir], ext=output_ext(t.get('output_format', 'png'))
+            )}
+        resolved.append(t)
+    tasks = resolved
+    if max_workers is None:
+        max_workers = default_max_workers()
+    if use_processes is None:
+        use_processes = total >= PROCESS_MIN_TASKS_PER_WORKER * max_workers
+    pool_workers = max_workers
+    # 任务按块提交，每块约为 总数/(4*并发数)，既能均衡负载又不必为每张图创建一个 future；
+    # 并发数不超过块数，任务很少时不启动拿不到任务的 worker（每个进程还要反序列化一遍水印）
+    chunk_size = max(1, total // (4 * max_workers))
+    max_workers = min(max_workers, math.ceil(total / chunk_size))
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = []
+    batch_dir = None
+    if use_processes:
+        # 复用的进程池无法通过 initializer 传入本批次的水印：相同的水印图只写一次临时文件，
+        # 任务中只携带 (路径, mode, size)。spawn 方式的进程池按需启动子进程，
+        # 同时运行的块不超过 max_workers，因此沿用未截断的并发数创建进程池即可跨批次复用
+        batch_dir = tempfile.mkdtemp(prefix='watermarker_')
+        refs = {}
+        payload = []
         for t in tasks:
-            futures.append(ex.submit(worker, t))
-        for i, f in enumerate(concurrent.futures.as_completed(futures), start=1):
-            success, msg = f.result()
-            if progress_callback:
-                progress_callback(i, total, success, msg)
-            results.append((success, msg))
+            if 'watermark_img' not in t:
+                payload.append(t)
+                continue
+            key = id(t['watermark_img'])
+            if key not in refs:
+                refs[key] = _write_watermark(t['watermark_img'], batch_dir, len(refs))
+            payload.append({**t, 'watermark_img': refs[key]})
+        executor = get_process_pool(pool_workers)
+    else:
+        # 线程共享同一个水印对象，派发前为每个不同的水印拆分一次通道
+        prepared_by_id = {}
+        payload = []
+        for t in tasks:
+            if 'watermark_img' in t:
+                key = id(t['watermark_img'])
+                if key not in prepared_by_id:
+                    prepared_by_id[key] = prepare_watermark(t['watermark_img'])
+                t = {**t, 'watermark_prepared': prepared_by_id[key]}
+            payload.append(t)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    futures = []
+    try:
+        for i in range(0, total, chunk_size):
+            futures.append(executor.submit(_export_chunk, payload[i:i + chunk_size]))
+        done = 0
+        for f in concurrent.futures.as_completed(futures):
+            for success, msg in f.result():
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total, success, msg)
+                results.append((success, msg))
+    except BrokenProcessPool:
+        _discard_process_pool(executor)
+        raise
+    finally:
+        if use_processes:
+            # 出错提前退出时也要等已提交的块结束，再删除它们要读取的水印文件
+            concurrent.futures.wait(futures)
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        else:
+            executor.shutdown()
     return results
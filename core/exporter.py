@@ -1,7 +1,16 @@
 # core/exporter.py
 from PIL import Image, ImageOps
+import io
 import os
 import json
+from core.image_io import resize_image
+
+def prepare_watermark(watermark_img):
+    """
+    预先拆出水印的 RGB 与 alpha 通道，供 RGB 底图路径直接 paste 使用。
+    同一水印批量合成到多张图片时只需调用一次，结果通过 compose_watermark_on_image 的 prepared 参数传入
+    """
+    return watermark_img.convert('RGB'), watermark_img.getchannel('A')
 
 def compose_watermark_on_image(
     src_path,
@@ -10,18 +19,30 @@ def compose_watermark_on_image(
     anchor=(0.5,0.5),     # 归一化坐标 (0..1, 0左/0顶)
     output_format='png',  # 'png' or 'jpeg'
     jpeg_quality=90,
-    resize_to=None        # (w,h) 或 None
+    resize_to=None,       # (w,h) 或 None
+    optimize=False,       # JPEG 是否做第二遍 Huffman 优化（体积略小，编码更慢）
+    progressive=False,    # 是否输出渐进式 JPEG
+    subsampling=-1,       # JPEG 色度抽样: 0=4:4:4, 1=4:2:2, 2=4:2:0, -1=编码器默认(4:2:0)
+    compress_level=1,     # PNG 压缩级别 0..9，越大体积越小、编码越慢
+    prepared=None         # prepare_watermark(watermark_img) 的结果，批量复用时传入
 ):
     """
     把 watermark_img 合成到 src_path 上并保存。
     anchor 表示水印的中心点相对于目标图片左上角的位置（归一化）。
     watermark_img 应该是 RGBA，已包含需要的透明度与效果。
+    编码参数默认偏向批量导出的速度；需要归档级体积时可传 optimize=True、compress_level=9。
     """
     img = Image.open(src_path)
-    img = ImageOps.exif_transpose(img).convert('RGBA')
+    img = ImageOps.exif_transpose(img)
+
+    # 输出 JPEG 且原图不带透明通道时，全程在 RGB 中处理：
+    # 不给整幅图增加 alpha 通道（每像素 3 字节而不是 4），最后也无需再转换一次
+    is_jpeg = output_format.lower() in ('jpg', 'jpeg')
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    img = img.convert('RGB' if is_jpeg and not has_alpha else 'RGBA')
 
     if resize_to:
-        img = img.resize(resize_to, Image.LANCZOS)
+        img = resize_image(img, resize_to)
 
     iw, ih = img.size
     ww, wh = watermark_img.size
@@ -33,16 +54,31 @@ def compose_watermark_on_image(
     left = center_x - ww // 2
     top = center_y - wh // 2
 
-    # 创建叠加层
-    layer = Image.new('RGBA', img.size, (0,0,0,0))
-    layer.paste(watermark_img, (left, top), watermark_img)  # 使用 watermark 的 alpha 作为 mask
+    # 只在水印与图片的重叠区域内合成，避免分配并遍历整幅图大小的透明叠加层
+    region = (max(0, left), max(0, top), min(iw, left + ww), min(ih, top + wh))
+    if img.mode == 'RGB':
+        # 不透明底图上的 over 合成等价于以水印 alpha 为 mask 的 paste（超出边界部分由 paste 自动裁剪）
+        wm_rgb, wm_alpha = prepared or prepare_watermark(watermark_img)
+        img.paste(wm_rgb, (left, top), wm_alpha)
+    elif region[0] < region[2] and region[1] < region[3]:
+        wm_box = (region[0] - left, region[1] - top, region[2] - left, region[3] - top)
+        # 水印完全落在图内时无需再裁剪一份
+        wm_crop = watermark_img if wm_box == (0, 0, ww, wh) else watermark_img.crop(wm_box)
+        # 直接把合成结果贴回原图；Image.alpha_composite 实例方法会先把结果再拷回裁剪块，多一次复制
+        img.paste(Image.alpha_composite(img.crop(region), wm_crop), region[:2])
 
-    composed = Image.alpha_composite(img, layer)  # RGBA
+    composed = img  # RGB 或 RGBA
 
-    if output_format.lower() in ('jpg', 'jpeg'):
+    # 先编码到内存，再一次性写入目标文件：编码器不会产生大量小块写入，
+    # 在网络盘（NFS/SMB）和多进程并发导出时吞吐更好
+    buf = io.BytesIO()
+    if is_jpeg:
         rgb = composed.convert('RGB')
-        rgb.save(dst_path, 'JPEG', quality=jpeg_quality, optimize=True)
+        rgb.save(buf, 'JPEG', quality=jpeg_quality, optimize=optimize, progressive=progressive,
+                 subsampling=subsampling)
     else:
-        composed.save(dst_path, 'PNG', compress_level=6)
+        composed.save(buf, 'PNG', compress_level=compress_level)
+    with open(dst_path, 'wb') as f:
+        f.write(buf.getbuffer())
 
     return dst_path
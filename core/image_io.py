@@ -1,19 +1,160 @@
 # core/image_io.py
-from PIL import Image, ImageOps
+from PIL import Image, ImageOps, features
+import PIL
+import io
 import os
+import struct
 
 SUPPORTED_EXTS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
 
-def is_image_file(path):
+# 各格式文件头的魔数，用于在解码前快速排除扩展名正确但内容不是图片的文件
+_MAGIC_BY_EXT = {
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.png': (b'\x89PNG',),
+    '.bmp': (b'BM',),
+    '.tif': (b'II*\x00', b'MM\x00*'),
+    '.tiff': (b'II*\x00', b'MM\x00*'),
+}
+
+def is_image_file(path, check_header=False):
+    """
+    按扩展名判断是否为支持的图片；check_header=True 时再读取文件头前 12 字节核对魔数，
+    只需一次小读取，不会触发解码
+    """
     _, ext = os.path.splitext(path.lower())
-    return ext in SUPPORTED_EXTS
+    if ext not in SUPPORTED_EXTS:
+        return False
+    if not check_header:
+        return True
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    return head.startswith(_MAGIC_BY_EXT[ext])
 
 def open_image_fix_orientation(path):
     img = Image.open(path)
     img = ImageOps.exif_transpose(img)  # 修正 EXIF 方向
     return img
 
-def generate_thumbnail(path, max_size=1024):
-    img = open_image_fix_orientation(path)
-    img.thumbnail((max_size, max_size), Image.LANCZOS)
+def get_image_size(path):
+    """只读取文件头得到 (w, h)，并按 EXIF 方向（5..8 为转置）交换宽高，不解码像素"""
+    with Image.open(path) as img:
+        w, h = img.size
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):
+            return h, w
+    return w, h
+
+def resize_image(img, size):
+    """按目标尺寸 (w,h) 缩放；尺寸未变化时直接返回原图，避免一次无意义的重采样"""
+    size = tuple(size)
+    if img.size == size:
+        return img
+    # 大比例缩小时先用 reduce() 做整数倍预缩小（保留 >=2 倍余量），再以 LANCZOS 精修到目标尺寸。
+    # 注意 Pillow 对 RGBA 的 resize 会忽略 reducing_gap 参数，所以这里显式处理
+    factor_x = max(1, int(img.width / size[0] / 2))
+    factor_y = max(1, int(img.height / size[1] / 2))
+    if factor_x > 1 or factor_y > 1:
+        img = img.reduce((factor_x, factor_y))
+    return img.resize(size, Image.LANCZOS)
+
+# EXIF 方向 -> 把图像转正所需的 transpose 操作（与 ImageOps.exif_transpose 一致）
+_ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT, 3: Image.ROTATE_180, 4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE, 6: Image.ROTATE_270, 7: Image.TRANSVERSE, 8: Image.ROTATE_90,
+}
+
+def _exif_thumbnail_bytes(exif):
+    """
+    从 JPEG APP1 的 EXIF 数据中取出 IFD1 内嵌缩略图（JPEGInterchangeFormat 0x0201 / 长度 0x0202）的字节，
+    没有时返回 None。直接按 TIFF 结构解析，不依赖各 Pillow 版本读取 IFD1 的接口差异
+    """
+    if exif.startswith(b'Exif\x00\x00'):
+        exif = exif[6:]
+    if exif[:2] == b'II':
+        e = '<'
+    elif exif[:2] == b'MM':
+        e = '>'
+    else:
+        return None
+    tags = {}
+    try:
+        ifd0 = struct.unpack_from(e + 'I', exif, 4)[0]
+        count = struct.unpack_from(e + 'H', exif, ifd0)[0]
+        ifd1 = struct.unpack_from(e + 'I', exif, ifd0 + 2 + 12 * count)[0]
+        if not ifd1:
+            return None
+        count = struct.unpack_from(e + 'H', exif, ifd1)[0]
+        for i in range(count):
+            tag, typ, _, value = struct.unpack_from(e + 'HHI4s', exif, ifd1 + 2 + 12 * i)
+            if tag in (0x0201, 0x0202):
+                # SHORT(3) 值左对齐存放在 4 字节里，其余按 LONG 读取
+                tags[tag] = struct.unpack_from(e + ('H' if typ == 3 else 'I'), value)[0]
+    except struct.error:
+        return None
+    start, length = tags.get(0x0201), tags.get(0x0202)
+    if not start or not length:
+        return None
+    data = exif[start:start + length]
+    return data if data.startswith(b'\xff\xd8') else None
+
+def _embedded_thumbnail(img, max_size, resample):
+    """
+    相机 JPEG 的 EXIF 内嵌缩略图，解码它只需读几十 KB，不必解码原图。
+    只有最长边不小于 max_size、且宽高比与原图一致（不带黑边）时才采用；
+    返回已按 EXIF 方向转正并缩放到 max_size 的图像，不可用时返回 None
+    """
+    data = _exif_thumbnail_bytes(img.info.get('exif', b''))
+    if data is None:
+        return None
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except OSError:
+        return None
+    tw, th = thumb.size
+    if max(tw, th) < max_size or abs(tw * img.height - th * img.width) > 0.02 * th * img.width:
+        return None
+    method = _ORIENTATION_TRANSPOSE.get(img.getexif().get(0x0112))
+    if method is not None:
+        thumb = thumb.transpose(method)
+    thumb.thumbnail((max_size, max_size), resample, reducing_gap=2.0)
+    return thumb
+
+def embedded_thumbnail(path, max_size, resample=Image.BILINEAR):
+    """只读取文件头中的 EXIF 内嵌缩略图，不解码原图；非 JPEG 或不满足条件时返回 None"""
+    try:
+        with Image.open(path) as img:
+            if img.format != 'JPEG':
+                return None
+            return _embedded_thumbnail(img, max_size, resample)
+    except OSError:
+        return None
+
+def generate_thumbnail(path, max_size=1024, resample=Image.LANCZOS):
+    """
+    resample: 最终缩放所用的滤波器。预览底图保持 LANCZOS；
+    列表图标很小、导入时批量生成，可传 Image.BILINEAR 换取速度
+    """
+    img = Image.open(path)
+    if img.format == 'JPEG':
+        thumb = _embedded_thumbnail(img, max_size, resample)
+        if thumb is not None:
+            return thumb
+        # 让 libjpeg 在解码时直接按 1/2、1/4、1/8 缩小（DCT 域），必须在 exif_transpose 触发解码之前调用
+        img.draft(None, (max_size, max_size))
+    img = ImageOps.exif_transpose(img)  # 修正 EXIF 方向
+    img.thumbnail((max_size, max_size), resample, reducing_gap=2.0)
     return img  # PIL.Image instance
+
+def is_pillow_simd():
+    """Pillow-SIMD 的版本号带 .postN 后缀（如 9.0.0.post1）"""
+    return '.post' in PIL.__version__
+
+def pillow_build_info():
+    """返回当前 Pillow 构建的一行摘要，便于确认是否启用了 SIMD 内核与 libjpeg-turbo"""
+    name = 'Pillow-SIMD' if is_pillow_simd() else 'Pillow'
+    turbo = '是' if features.check_feature('libjpeg_turbo') else '否'
+    return f"{name} {PIL.__version__} (libjpeg-turbo: {turbo})"
@@ -1,4 +1,4 @@
-# core/templates.py
+# core/template_manager.py
 import json
 import os
 
@@ -39,11 +39,13 @@ class TemplateManager:
 
     def save_templates(self):
         """保存模板文件"""
+        # 先在内存中序列化，再一次性写入；json.dump 会把内容拆成大量小块逐次写文件
+        text = json.dumps(
+            {"templates": self.templates, "last_used": self.last_used},
+            indent=4, ensure_ascii=False
+        )
         with open(TEMPLATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(
-                {"templates": self.templates, "last_used": self.last_used},
-                f, indent=4, ensure_ascii=False
-            )
+            f.write(text)
 
     def save_template(self, name, settings):
         """保存当前设置为模板"""
@@ -54,8 +56,10 @@ class TemplateManager:
     def load_template(self, name):
         """加载指定模板"""
         if name in self.templates:
-            self.last_used = name
-            self.save_templates()
+            # 只有 last_used 真正变化时才回写文件，重复选择同一模板不产生磁盘写入
+            if self.last_used != name:
+                self.last_used = name
+                self.save_templates()
             return self.templates[name]
         return None
 
@@ -1,10 +1,70 @@
 # core/watermark.py
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import functools
 import math
+import os
+
+# 默认字体为随程序附带的华文中宋，按本模块位置定位，与当前工作目录和操作系统无关
+DEFAULT_FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "resources", "华文中宋.ttf")
+
+@functools.lru_cache(maxsize=128)
+def _load_font(font_path, font_size):
+    """
+    按 (字体路径, 字号) 缓存字体对象，避免每次渲染都重新解析 TTF 文件。
+    粗体/斜体由渲染后处理模拟，不影响字体对象，无需计入键；
+    预览调整字号与导出按各图尺寸换算字号都会产生新键，容量留得宽一些
+    """
+    if font_path:
+        return ImageFont.truetype(font_path, font_size)
+    return ImageFont.load_default()
+
+def _blur(img, radius):
+    """
+    阴影模糊。小半径（<=4）时用两次 BoxBlur 近似高斯，比 GaussianBlur（内部三次盒式模糊）少一遍；
+    盒半径按方差匹配：两次半径 R 的盒式模糊方差为 ((2R+1)^2-1)/6，令其等于 radius^2
+    """
+    if radius <= 4:
+        box = ImageFilter.BoxBlur((math.sqrt(6 * radius * radius + 1) - 1) / 2)
+        return img.filter(box).filter(box)
+    return img.filter(ImageFilter.GaussianBlur(radius=radius))
+
+@functools.lru_cache(maxsize=8)
+def _shadow_layer(text, font_path, font_size, canvas_size, pos, fill, radius):
+    """
+    绘制并模糊阴影层。阴影只取决于文字、字体、位置与模糊半径，与文字颜色、透明度无关，
+    单独缓存后调整颜色或拖动透明度滑块时不必重新模糊；返回的图像被共享，调用方不要原地修改
+    """
+    layer = Image.new("RGBA", canvas_size, (0,0,0,0))
+    ImageDraw.Draw(layer).text(pos, text, font=_load_font(font_path, font_size), fill=fill)
+    return _blur(layer, radius)
+
+@functools.lru_cache(maxsize=16)
+def _text_mask(text, font_path, font_size, canvas_size, pos):
+    """
+    文字覆盖率蒙版（L 模式），与颜色、透明度无关；返回的图像被共享，调用方不要原地修改
+    """
+    mask = Image.new("L", canvas_size, 0)
+    ImageDraw.Draw(mask).text(pos, text, font=_load_font(font_path, font_size), fill=255)
+    return mask
+
+def _tinted_text_layer(text, font_path, font_size, canvas_size, pos, fill):
+    """
+    在全透明图层上绘制无描边文字，结果与 ImageDraw.text 逐像素一致：
+    蒙版按字体参数缓存，换颜色、透明度时只需几次查表（point）与合并通道，不再经过 FreeType 栅格化
+    """
+    mask = _text_mask(text, font_path, font_size, canvas_size, pos)
+    a = fill[3]
+    # 完全透明处 RGB 为 0，与直接绘制一致（粗体膨胀、斜体重采样都会用到这些像素）
+    channels = [mask.point([c if v else 0 for v in range(256)]) for c in fill[:3]]
+    # 不透明（a=255）时 alpha 恰好就是覆盖率蒙版：预览在无阴影、非粗体时总是按不透明渲染
+    #（透明度交给图元），这是最常见的情况，省掉一次查表；merge 会复制通道，不会改动缓存的蒙版
+    alpha = mask if a == 255 else mask.point([(v * a + 127) // 255 for v in range(256)])
+    return Image.merge("RGBA", (*channels, alpha))
 
 def create_text_watermark_image(
     text,
-    font_path="C:\\code\\Photo_Watermark2\\resources\\华文中宋.ttf",
+    font_path=DEFAULT_FONT_PATH,
     font_size=64,
     color=(255,255,255,255),
     opacity=0.5,       # 0..1
@@ -23,79 +83,126 @@ def create_text_watermark_image(
     opacity: 文字主色的不透明度（0..1）
     """
     # 1. 载入字体
-    if font_path:
-        font = ImageFont.truetype(font_path, font_size)
-    else:
-        font = ImageFont.load_default()
+    font = _load_font(font_path, font_size)
 
     # 临时画板测量
     dummy = Image.new("RGBA", (10,10), (0,0,0,0))
     draw = ImageDraw.Draw(dummy)
 
-    # 允许换行或缩放以适配 max_width（可扩展）
     # 允许换行或缩放以适配 max_width（可扩展）
     bbox = draw.multiline_textbbox((0, 0), text, font=font, stroke_width=stroke_width)
-    # bbox = (left, top, right, bottom)
+    # bbox = (left, top, right, bottom)，已包含描边宽度
     w = bbox[2] - bbox[0]
     h = bbox[3] - bbox[1]
-    canvas_w = w + abs(shadow_offset[0]) + stroke_width*4
-    canvas_h = h + abs(shadow_offset[1]) + stroke_width*4
 
-    canvas = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
-    draw = ImageDraw.Draw(canvas)
+    # 画布按文字实际外接框计算，只为真正绘制的效果留边：
+    # 阴影的模糊扩散与偏移（仅 shadow_blur > 0 时绘制阴影）、粗体膨胀的 1px
+    pad_l = pad_t = pad_r = pad_b = 1 if bold else 0
+    if shadow_blur > 0:
+        spread = shadow_blur * 2
+        pad_l += spread + max(0, -shadow_offset[0])
+        pad_r += spread + max(0, shadow_offset[0])
+        pad_t += spread + max(0, -shadow_offset[1])
+        pad_b += spread + max(0, shadow_offset[1])
+    canvas_w = max(1, w + pad_l + pad_r)
+    canvas_h = max(1, h + pad_t + pad_b)
+
+    canvas_size = (canvas_w, canvas_h)
+    # 画布延迟创建：在它仍是空白时，直接把阴影层/文字层当作画布，
+    # 省去一次整幅 RGBA 分配和一次与全透明图的 alpha_composite
+    canvas = None
+
+    # 外接框已计入字体上方留白，直接按 bbox 偏移定位，不再用字号估算
+    x = pad_l - bbox[0]
+    y = pad_t - bbox[1]
 
-    pad = stroke_width   # 20% 字高作为 padding
-    x = pad
-    y = pad - int(font_size * 0.2)
-    
     fill_color = (*color[:3], int(255 * opacity))
     # draw.text((x, y), text, font=font, fill=fill_color, stroke_width=stroke_width, stroke_fill=stroke_fill)
 
         # 绘制阴影
     if shadow_blur > 0:
-        shadow_layer = Image.new("RGBA", canvas.size, (0,0,0,0))
-        sd = ImageDraw.Draw(shadow_layer)
         sx = x + shadow_offset[0]
         sy = y + shadow_offset[1]
-        sd.text((sx, sy), text, font=font, fill=(*stroke_fill[:3], int(255*0.7)))
-        shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(radius=shadow_blur))
-        canvas = Image.alpha_composite(canvas, shadow_layer)
-        draw = ImageDraw.Draw(canvas)
+        canvas = _shadow_layer(text, font_path, font_size, canvas_size, (sx, sy),
+                               (*stroke_fill[:3], int(255*0.7)), shadow_blur)
 
     if bold or italic:
         # 创建临时图层
-        temp_layer = Image.new("RGBA", canvas.size, (0,0,0,0))
-        temp_draw = ImageDraw.Draw(temp_layer)
-        temp_draw.text((x, y), text, font=font, fill=fill_color, stroke_width=stroke_width, stroke_fill=stroke_fill)
+        if stroke_width == 0:
+            temp_layer = _tinted_text_layer(text, font_path, font_size, canvas_size, (x, y), fill_color)
+        else:
+            temp_layer = Image.new("RGBA", canvas_size, (0,0,0,0))
+            temp_draw = ImageDraw.Draw(temp_layer)
+            temp_draw.text((x, y), text, font=font, fill=fill_color, stroke_width=stroke_width, stroke_fill=stroke_fill)
 
         # 模拟粗体
         if bold:
-            bold_layer = Image.new("RGBA", canvas.size, (0,0,0,0))
-            bold_draw = ImageDraw.Draw(bold_layer)
-            for dx in range(-1,2):
-                for dy in range(-1,2):
-                    bold_draw.text((x+dx, y+dy), text, font=font, fill=fill_color, stroke_width=stroke_width, stroke_fill=stroke_fill)
+            # 对已渲染的文字做 3x3 最大值滤波（向四周膨胀 1px），代替 9 次偏移重绘
+            bold_layer = temp_layer.filter(ImageFilter.MaxFilter(3))
             temp_layer = Image.alpha_composite(temp_layer, bold_layer)
-            
+
 
         # 模拟斜体
         if italic:
             w,h = temp_layer.size
             shear = 0.3  # 可以调整倾斜角度
+            # 错切后再横向压缩回原宽度，两步合并为一次仿射变换，只做一次重采样；
+            # 平移 -shear*h 让底部行不被裁掉左侧笔画
+            scale_x = int(w + h*shear) / w
             temp_layer = temp_layer.transform(
-                (int(w + h*shear), h),
+                (w, h),
                 Image.AFFINE,
-                (1, shear, 0, 0, 1, 0),
+                (scale_x, shear, -shear*h, 0, 1, 0),
                 Image.BICUBIC
             )
-            temp_layer = temp_layer.resize((w, h), Image.BICUBIC)
 
 
         # 合成到主画布
-        
-        canvas = Image.alpha_composite(canvas, temp_layer)
+        if canvas is None:
+            canvas = temp_layer
+        else:
+            canvas = Image.alpha_composite(canvas, temp_layer)
+    elif canvas is None and stroke_width == 0:
+        canvas = _tinted_text_layer(text, font_path, font_size, canvas_size, (x, y), fill_color)
     else:
+        # 叠加在阴影上时仍直接绘制：ImageDraw 的混合方式与 alpha_composite 不同，替换会改变效果
+        if canvas is None:
+            canvas = Image.new("RGBA", canvas_size, (0,0,0,0))
+        else:
+            canvas = canvas.copy()  # 阴影层来自缓存，不能在其上直接绘制
+        draw = ImageDraw.Draw(canvas)
         draw.text((x, y), text, font=font, fill=fill_color, stroke_width=stroke_width, stroke_fill=stroke_fill)
 
 
     return canvas  # RGBA image
+
+
+_TRANSPOSE_BY_ANGLE = {90: Image.ROTATE_90, 180: Image.ROTATE_180, 270: Image.ROTATE_270}
+
+def rotate_watermark(img, angle, resample=Image.BICUBIC):
+    """
+    逆时针旋转水印并扩展画布。0°/360° 直接返回原图（不复制），
+    90° 的整数倍用 transpose 做无损的块拷贝，其余角度才按 resample 重采样；
+    默认 BICUBIC，质量要求不高的场合可传 Image.BILINEAR（2x2 采样，快数倍）
+    """
+    angle = angle % 360
+    if angle == 0:
+        return img
+    if angle in _TRANSPOSE_BY_ANGLE:
+        return img.transpose(_TRANSPOSE_BY_ANGLE[angle])
+    return img.rotate(angle, expand=True, resample=resample)
+
+
+@functools.lru_cache(maxsize=16)
+def _create_text_watermark_image_by_key(key):
+    return create_text_watermark_image(**dict(key))
+
+def create_text_watermark_image_cached(**kwargs):
+    """
+    带缓存的 create_text_watermark_image：参数完全相同时直接返回之前渲染好的图像。
+    返回的 Image 会被多个调用方共享，调用方不要原地修改它（rotate 等返回新图的操作不受影响）
+    """
+    key = tuple(sorted(
+        (k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items()
+    ))
+    return _create_text_watermark_image_by_key(key)
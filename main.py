@@ -7,12 +7,12 @@
 # 标准库导入
 import sys
 import os
+import multiprocessing
 import io
+from collections import OrderedDict
 from pathlib import Path
 
 # 第三方库导入
-from PIL import Image
-from PIL.ImageQt import ImageQt
 from PySide6.QtWidgets import (
     QApplication, QWidget, QPushButton, QLabel, QListWidget, QListWidgetItem,
     QHBoxLayout, QVBoxLayout, QFileDialog, QGraphicsView, QGraphicsScene,
@@ -20,18 +20,56 @@ from PySide6.QtWidgets import (
     QFontComboBox, QColorDialog, QCheckBox, QInputDialog, QGraphicsItem,
     QGroupBox, QFrame, QScrollArea, QSplitter
 )
-from PySide6.QtGui import QPixmap, QImage, Qt, QColor, QFont, QPalette
-from PySide6.QtCore import QSize, QPointF, Signal, QObject, QThread
+from PySide6.QtGui import QPixmap, QImage, QImageReader, Qt, QColor, QFont, QPalette
+from PySide6.QtCore import QSize, QPoint, QPointF, QRectF, Signal, QObject, QThread, QTimer, QRunnable, QThreadPool
 
 # 本地模块导入
-from core.image_io import is_image_file, generate_thumbnail, open_image_fix_orientation
-from core.watermark import create_text_watermark_image
-from core.exporter import compose_watermark_on_image
+from core.image_io import (
+    is_image_file, generate_thumbnail, embedded_thumbnail, get_image_size, pillow_build_info, is_pillow_simd
+)
+# core.watermark(字体渲染)与 core.batch_worker(导出/进程池)在首次使用时才导入,缩短启动到首次显示的时间
+from core.thumb_cache import (
+    get_thumbnail, thumbnail_cache_path, save_to_cache, mark_used, CACHE_FORMAT, CACHE_QUALITY
+)
 from core.template_manager import TemplateManager
 
 # 全局常量
 APP_NAME = "WatermarkerPy - 图片水印工具"
 SOURCE_DIR = "resources"  # 资源文件目录
+PREVIEW_SIZE = 1200  # 预览坐标系的最长边,字号与水印位置都以此坐标系为准
+
+_STYLESHEET = None
+
+def _load_stylesheet():
+    """
+    读取 resources/app.qss 全局样式表,只在第一次调用时读取文件
+    
+    返回:
+        str: 样式表文本,文件缺失时返回空字符串(使用Qt默认样式)
+    """
+    global _STYLESHEET
+    if _STYLESHEET is None:
+        try:
+            # 相对本文件定位,从其他工作目录启动时同样能找到样式表
+            qss_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SOURCE_DIR, "app.qss")
+            with open(qss_path, "r", encoding="utf-8") as f:
+                _STYLESHEET = f.read()
+        except OSError as e:
+            print(f"样式表加载失败: {e}")
+            _STYLESHEET = ""
+    return _STYLESHEET
+
+def preview_size_for(iw, ih):
+    """
+    计算图片在预览坐标系中的尺寸(最长边不超过 PREVIEW_SIZE,小图保持原尺寸)
+    
+    参数:
+        iw, ih: 原图宽高
+    返回:
+        tuple: 预览坐标系下的 (宽, 高)
+    """
+    scale = min(1.0, PREVIEW_SIZE / max(iw, ih))
+    return max(1, round(iw * scale)), max(1, round(ih * scale))
 
 def pil_to_qpixmap(img):
     """
@@ -43,17 +81,143 @@ def pil_to_qpixmap(img):
     返回:
         QPixmap: 转换后的QPixmap对象
     """
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    if not has_alpha:
+        # 不带透明度的底图(JPEG 预览、灰度/CMYK 图等)按 RGB888 传给Qt,
+        # 比转换为 RGBA 少 1/4 的像素数据,RGB 图则完全省去转换
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        data = img.tobytes("raw", "RGB")
+        qim = QImage(data, img.width, img.height, img.width * 3, QImage.Format_RGB888)
+        qim._data = data
+        return QPixmap.fromImage(qim)
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    # 直接用原始 RGBA 字节构造 QImage，省去 ImageQt 及再包一层 QImage 的两次像素拷贝
+    return rgba_bytes_to_qpixmap(img.tobytes("raw", "RGBA"), img.width, img.height)
+
+def rgba_bytes_to_qpixmap(data, width, height):
+    """
+    将紧密排列的 RGBA 字节转换为QPixmap对象（必须在UI线程调用）
+    
+    参数:
+        data: RGBA 像素字节,长度为 width*height*4
+        width, height: 图像尺寸
+        
+    返回:
+        QPixmap: 转换后的QPixmap对象
+    """
+    # QImage 不持有这块内存，需保持 data 的引用直到 fromImage 完成拷贝
+    qim = QImage(data, width, height, width * 4, QImage.Format_RGBA8888)
+    qim._data = data
+    return QPixmap.fromImage(qim)
+
+def pil_to_qimage(img):
+    """
+    将PIL图像转换为独立持有像素数据的QImage（可在工作线程中调用）
+
+    参数:
+        img: PIL.Image对象
+
+    返回:
+        QImage: RGBA8888 格式的图像
+    """
     if img.mode != "RGBA":
         img = img.convert("RGBA")
-    qim = ImageQt(img)
-    pix = QPixmap.fromImage(QImage(qim))
-    return pix
+    return QImage(img.tobytes("raw", "RGBA"), img.width, img.height,
+                  img.width * 4, QImage.Format_RGBA8888).copy()
+
+def load_list_thumbnail(path, max_size):
+    """
+    用Qt自带的解码器生成列表缩略图(可在工作线程中调用)
+    
+    设置缩放尺寸后,Qt 的 JPEG 插件会在解码时直接按 1/2~1/8 缩小,
+    结果直接是 QImage,省去 PIL 解码以及 PIL→Qt 的像素转换;结果同样写入磁盘缓存
+    
+    参数:
+        path: 图片路径
+        max_size: 缩略图最长边
+        
+    返回:
+        QImage: 缩略图,Qt 无法解码该文件时返回 None
+    """
+    try:
+        cache_path = thumbnail_cache_path(path, max_size)
+    except OSError:
+        cache_path = None
+    if cache_path and os.path.exists(cache_path):
+        img = QImage(cache_path)
+        if not img.isNull():
+            mark_used(cache_path)
+            return img
+
+    # 相机 JPEG 内嵌的 EXIF 缩略图足够大时直接使用,完全不解码原图
+    thumb = embedded_thumbnail(path, max_size)
+    if thumb is not None:
+        img = pil_to_qimage(thumb)
+    else:
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)  # 按 EXIF 方向旋转
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > max_size:
+            size.scale(max_size, max_size, Qt.KeepAspectRatio)
+            reader.setScaledSize(size)
+        img = reader.read()
+        if img.isNull():
+            return None
+    if cache_path:
+        # Qt 缺少 WebP 插件时 save 返回 False,只是不写缓存
+        save_to_cache(cache_path, lambda p: img.save(p, CACHE_FORMAT, CACHE_QUALITY))
+    return img
+
+class ThumbSignals(QObject):
+    """
+    缩略图工作任务的信号载体（QRunnable 本身不能定义信号）
+    
+    信号:
+        done: 缩略图任务结束 (图片路径, 缩略图QImage；生成失败时为空 QImage)
+    """
+    done = Signal(str, QImage)
+
+class ThumbWorker(QRunnable):
+    """
+    缩略图生成任务
+    
+    在线程池中完成解码与缩放,只把 QImage 交回UI线程;
+    QPixmap 只能在UI线程创建,由接收信号的槽函数完成最后一步转换
+    """
+    def __init__(self, path, max_size, signals):
+        """
+        参数:
+            path: 图片路径
+            max_size: 缩略图最长边
+            signals: 共享的 ThumbSignals 实例
+        """
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self.signals = signals
+
+    def run(self):
+        """生成缩略图并发送结果；失败时同样发送(空 QImage),UI 线程才能结束该项的等待状态"""
+        img = None
+        try:
+            img = load_list_thumbnail(self.path, self.max_size)
+            if img is None:
+                # Qt 不支持的格式(如部分 TIFF)退回 PIL 解码
+                img = pil_to_qimage(get_thumbnail(self.path, max_size=self.max_size))
+        except Exception as e:
+            print(f"缩略图生成失败 ({os.path.basename(self.path)}): {e}")
+        finally:
+            self.signals.done.emit(self.path, img if img is not None else QImage())
 
 class ExportWorker(QThread):
     """
     导出工作线程类
     
     用于在后台处理图片水印添加任务,避免阻塞UI线程
+    任务交给 batch_export 并行处理(小批次用线程,大批次用跨导出复用的进程池),
+    本线程只负责等待结果并转发进度
     
     信号:
         progress: 发送处理进度信息 (已完成数量, 总数量, 消息)
@@ -74,26 +238,22 @@ class ExportWorker(QThread):
 
     def run(self):
         """执行导出任务的主方法"""
-        total = len(self.tasks)
-        done = 0
-        
-        for task in self.tasks:
-            try:
-                # 为图片添加水印并保存
-                compose_watermark_on_image(
-                    task['src_path'],
-                    task['dst_path'],
-                    watermark_img=task['watermark_img'],
-                    anchor=task.get('anchor', (0.5, 0.5)),
-                    output_format=task.get('output_format', 'png'),
-                    jpeg_quality=task.get('jpeg_quality', 90),
-                    resize_to=task.get('resize_to', None)
-                )
-                done += 1
-                self.progress.emit(done, total, f"已保存: {task['dst_path']}")
-            except Exception as e:
-                # 处理错误并发送错误信息
-                self.progress.emit(done, total, f"错误 ({os.path.basename(task['src_path'])}): {e}")
+        def on_progress(done, total, success, message):
+            # 回调在本线程中执行,通过信号转发给UI线程
+            if success:
+                self.progress.emit(done, total, f"已保存: {message}")
+            else:
+                # message 为 "源文件名: 错误信息",按原来的格式显示出错的文件
+                name, _, error = message.partition(": ")
+                self.progress.emit(done, total, f"错误 ({name}): {error}")
+
+        from core.batch_worker import batch_export
+        try:
+            # 由 batch_export 按批次大小选择线程或进程:单张、少量导出不必付出启动子进程的开销
+            batch_export(self.tasks, progress_callback=on_progress)
+        except Exception as e:
+            # 进程池本身无法启动等情况
+            self.progress.emit(0, len(self.tasks), f"错误: {e}")
         
         # 所有任务完成,发送完成信号
         self.finished_signal.emit()
@@ -118,11 +278,11 @@ class WatermarkItem(QGraphicsPixmapItem):
         """
         处理图形项变化事件
         
-        当水印位置改变时,更新主窗口中的位置标签
+        当水印位置改变时,通知主窗口更新位置信息;
+        拖动过程中的连续变化由主窗口的定时器合并,每帧最多处理一次
         """
-        if change == QGraphicsItem.ItemPositionHasChanged:
-            x, y = int(value.x()), int(value.y())
-            self.main_window.update_position_label((x, y))
+        if change == QGraphicsItem.ItemPositionHasChanged and self.main_window._pos_observer:
+            self.main_window._pos_timer.start()
         return super().itemChange(change, value)
 
 
@@ -150,8 +310,45 @@ class MainWindow(QWidget):
 
         # 数据模型
         self.image_paths = []   # 图片路径列表
+        self._image_paths_set = set()  # 与 image_paths 同步,用于 O(1) 去重
         self.current_index = None  # 当前选中的图片索引
         self.thumb_size = 180  # 缩略图大小
+        self._pending_thumbs = {}  # 缩略图尚未生成的列表项: {路径: QListWidgetItem}
+        self._requested_thumbs = set()  # 已提交到线程池、尚未返回的缩略图路径
+        # 占位图标与缩略图同尺寸,图标到达前后行高不变,可见行的计算也就稳定
+        self._placeholder_icon = QPixmap(self.thumb_size, self.thumb_size)
+        self._placeholder_icon.fill(Qt.transparent)
+        # 缩略图生成失败时显示的灰色占位图标,同尺寸以保持行高
+        self._error_icon = QPixmap(self.thumb_size, self.thumb_size)
+        self._error_icon.fill(QColor(200, 200, 200))
+        self._thumb_signals = ThumbSignals()
+        self._thumb_signals.done.connect(self.on_thumbnail_ready)
+
+        # 预览水印缓存: 参数键 -> 最近一次渲染结果；旋转由图元的 setRotation 完成，不计入参数键
+        self._wm_cache_key = None
+        self._wm_cache_img = None
+        # 最近用过的预览水印: {参数键: (PIL图像, QPixmap 或 None)},按 LRU 保留 8 个,
+        # 来回切换粗体/颜色等设置时直接复用,不再重新栅格化和转换
+        self._wm_preview_cache = OrderedDict()
+        # 导出用高分辨率水印: (水印参数, {输出字号: 已旋转的水印图})
+        self._wm_export_cache = (None, {})
+        # 最近预览过的底图: {(路径, 修改时间, 渲染尺寸): QPixmap},按 LRU 保留 16 张
+        self._preview_cache = OrderedDict()
+
+        # 参数变化的信号先汇总到单次定时器，每帧（约 16ms）最多重绘一次预览水印；
+        # 需在 setup_ui 之前创建，控件初始化时触发的信号也会用到它
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(16)
+        self._update_timer.timeout.connect(self._do_update_preview_watermark)
+
+        # 水印位置观察者: callable((x, y)) 或 None。没有观察者时水印项不发送几何变化通知,
+        # 拖动时不会产生任何 Python 回调;有观察者时同样按帧合并
+        self._pos_observer = None
+        self._pos_timer = QTimer(self)
+        self._pos_timer.setSingleShot(True)
+        self._pos_timer.setInterval(16)
+        self._pos_timer.timeout.connect(self._notify_position)
 
         # 创建主布局
         self.setup_ui()
@@ -173,154 +370,7 @@ class MainWindow(QWidget):
 
     def setup_styles(self):
         """设置应用程序的全局样式"""
-        style = """
-            QWidget {
-                font-family: "Microsoft YaHei UI", "Segoe UI", Arial;
-                font-size: 9pt;
-            }
-            
-            QGroupBox {
-                font-weight: bold;
-                border: 2px solid #d0d0d0;
-                border-radius: 6px;
-                margin-top: 12px;
-                padding-top: 8px;
-                background-color: #fafafa;
-            }
-            
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top left;
-                padding: 4px 10px;
-                background-color: white;
-                border-radius: 4px;
-                color: #2c3e50;
-            }
-            
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                padding: 8px 16px;
-                font-weight: bold;
-            }
-            
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-            
-            QPushButton:pressed {
-                background-color: #21618c;
-            }
-            
-            QPushButton:disabled {
-                background-color: #bdc3c7;
-            }
-            
-            QPushButton#secondaryButton {
-                background-color: #95a5a6;
-            }
-            
-            QPushButton#secondaryButton:hover {
-                background-color: #7f8c8d;
-            }
-            
-            QPushButton#dangerButton {
-                background-color: #e74c3c;
-            }
-            
-            QPushButton#dangerButton:hover {
-                background-color: #c0392b;
-            }
-            
-            QPushButton#successButton {
-                background-color: #27ae60;
-            }
-            
-            QPushButton#successButton:hover {
-                background-color: #229954;
-            }
-            
-            QLineEdit, QSpinBox, QComboBox {
-                border: 1px solid #bdc3c7;
-                border-radius: 4px;
-                padding: 6px;
-                background-color: white;
-            }
-            
-            QLineEdit:focus, QSpinBox:focus, QComboBox:focus {
-                border: 2px solid #3498db;
-            }
-            
-            QSlider::groove:horizontal {
-                border: 1px solid #bdc3c7;
-                height: 6px;
-                background: #ecf0f1;
-                border-radius: 3px;
-            }
-            
-            QSlider::handle:horizontal {
-                background: #3498db;
-                border: 1px solid #2980b9;
-                width: 16px;
-                height: 16px;
-                margin: -6px 0;
-                border-radius: 8px;
-            }
-            
-            QSlider::handle:horizontal:hover {
-                background: #2980b9;
-            }
-            
-            QListWidget {
-                border: 1px solid #bdc3c7;
-                border-radius: 6px;
-                background-color: white;
-                padding: 4px;
-            }
-            
-            QListWidget::item {
-                border-radius: 4px;
-                padding: 4px;
-            }
-            
-            QListWidget::item:selected {
-                background-color: #3498db;
-                color: white;
-            }
-            
-            QListWidget::item:hover {
-                background-color: #ecf0f1;
-            }
-            
-            QCheckBox {
-                spacing: 8px;
-            }
-            
-            QCheckBox::indicator {
-                width: 18px;
-                height: 18px;
-                border-radius: 3px;
-                border: 2px solid #bdc3c7;
-            }
-            
-            QCheckBox::indicator:checked {
-                background-color: #3498db;
-                border-color: #2980b9;
-            }
-            
-            QLabel {
-                color: #2c3e50;
-            }
-            
-            QGraphicsView {
-                border: 2px solid #bdc3c7;
-                border-radius: 6px;
-                background-color: #ecf0f1;
-            }
-        """
-        self.setStyleSheet(style)
+        self.setStyleSheet(_load_stylesheet())
 
     def setup_ui(self):
         """设置用户界面布局"""
@@ -372,6 +422,13 @@ class MainWindow(QWidget):
         # 缩略图列表
         self.list_widget = QListWidget()
         self.list_widget.setIconSize(QSize(self.thumb_size, self.thumb_size))
+        # 每行都是同样大小的图标(先是占位图)加一行文件名,行高一致,
+        # 布局时不必逐项计算尺寸,一次导入上千张图片时插入与滚动都更快
+        self.list_widget.setUniformItemSizes(True)
+        # 支持 Ctrl/Shift 多选，一次导出多张图片
+        self.list_widget.setSelectionMode(QListWidget.ExtendedSelection)
+        # 缩略图只为滚动到可见区域的列表项生成
+        self.list_widget.verticalScrollBar().valueChanged.connect(self.request_visible_thumbnails)
         self.list_widget.itemClicked.connect(self.on_thumb_clicked)
         layout.addWidget(self.list_widget)
         
@@ -394,6 +451,8 @@ class MainWindow(QWidget):
         self.view.setScene(self.scene)
         self.base_item = None
         self.wm_item = None
+        self.preview_size = None  # 预览坐标系下底图的 (w, h)
+        self._preview_render_px = 0  # 当前底图实际渲染的最长边像素数
         layout.addWidget(self.view)
         
         # 提示文本
@@ -658,6 +717,23 @@ class MainWindow(QWidget):
         """更新位置标签(保留接口兼容性)"""
         pass
 
+    def set_position_observer(self, callback):
+        """
+        设置水印位置观察者
+        
+        参数:
+            callback: callable((x, y)),传入 None 取消观察
+        """
+        self._pos_observer = callback
+        if self.wm_item is not None:
+            self.wm_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges, callback is not None)
+
+    def _notify_position(self):
+        """把水印当前位置发送给观察者"""
+        if self._pos_observer and self.wm_item is not None:
+            pos = self.wm_item.pos()
+            self._pos_observer((int(pos.x()), int(pos.y())))
+
     def save_current_as_template(self):
         """将当前水印设置保存为模板"""
         name, ok = QInputDialog.getText(self, "保存模板", "请输入模板名称:")
@@ -826,112 +902,307 @@ class MainWindow(QWidget):
             p = Path(p)
             if p.is_dir():
                 for f in p.rglob("*"):
-                    if is_image_file(str(f)):
+                    if is_image_file(str(f), check_header=True):
                         new.append(str(f))
-            elif p.is_file() and is_image_file(str(p)):
+            elif p.is_file() and is_image_file(str(p), check_header=True):
                 new.append(str(p))
         
-        for s in new:
-            if s not in self.image_paths:
-                self.image_paths.append(s)
-                self.add_thumbnail_item(s)
+        # 批量插入期间暂停重绘与信号,所有列表项加入后只做一次布局和刷新
+        self.list_widget.setUpdatesEnabled(False)
+        self.list_widget.blockSignals(True)
+        try:
+            for s in new:
+                if s not in self._image_paths_set:
+                    self._image_paths_set.add(s)
+                    self.image_paths.append(s)
+                    self.add_thumbnail_item(s)
+        finally:
+            self.list_widget.blockSignals(False)
+            self.list_widget.setUpdatesEnabled(True)
+            self.list_widget.viewport().update()
+        # 等列表完成布局后再计算可见行
+        QTimer.singleShot(0, self.request_visible_thumbnails)
 
     def add_thumbnail_item(self, path):
-        """添加缩略图到列表控件"""
-        thumb = generate_thumbnail(path, max_size=self.thumb_size)
-        pix = pil_to_qpixmap(thumb)
+        """添加缩略图到列表控件（先以占位图标插入,滚动到可见区域时再生成缩略图）"""
         item = QListWidgetItem(Path(path).name)
         item.setData(Qt.UserRole, path)
-        item.setIcon(pix)
+        item.setData(Qt.UserRole + 1, len(self.image_paths) - 1)  # 在 image_paths 中的下标
+        item.setIcon(self._placeholder_icon)
         self.list_widget.addItem(item)
+        self._pending_thumbs[path] = item
+
+    def request_visible_thumbnails(self, *args):
+        """为可见行(前后各多预取几行)中尚未生成缩略图的列表项提交线程池任务"""
+        if len(self._requested_thumbs) >= len(self._pending_thumbs):
+            return
+        lw = self.list_widget
+        count = lw.count()
+        rect = lw.viewport().rect()
+        # 向内缩进几个像素再探测,避免落在项间距或边框上而取不到行号
+        first = lw.indexAt(rect.topLeft() + QPoint(2, 2)).row()
+        last = lw.indexAt(rect.bottomLeft() + QPoint(2, -2)).row()
+        if first < 0:
+            first = 0
+        prefetch = 4
+        if last < 0:
+            # 列表末尾未填满视口等情况下仍取不到时,按行高估算可见行数,
+            # 不能退回到 count - 1,否则会一次性为整个列表生成缩略图
+            row_height = lw.sizeHintForRow(first) if count else -1
+            if row_height <= 0:
+                row_height = self.thumb_size
+            visible_rows = rect.height() // row_height + 1
+            # 预取行数由下面的遍历范围统一加上
+            last = min(count - 1, first + visible_rows)
+        pool = QThreadPool.globalInstance()
+        for row in range(max(0, first - prefetch), min(count, last + prefetch + 1)):
+            path = lw.item(row).data(Qt.UserRole)
+            if path in self._pending_thumbs and path not in self._requested_thumbs:
+                self._requested_thumbs.add(path)
+                pool.start(ThumbWorker(path, self.thumb_size, self._thumb_signals))
+
+    def on_thumbnail_ready(self, path, img):
+        """缩略图任务结束,在UI线程中设置图标；生成失败(空 QImage)时换成错误占位图标"""
+        self._requested_thumbs.discard(path)
+        item = self._pending_thumbs.pop(path, None)
+        if item is not None:
+            item.setIcon(self._error_icon if img.isNull() else QPixmap.fromImage(img))
 
     def on_thumb_clicked(self, item):
         """缩略图点击事件处理"""
         path = item.data(Qt.UserRole)
-        idx = self.image_paths.index(path)
+        idx = item.data(Qt.UserRole + 1)
         self.current_index = idx
         self.show_preview(path)
 
     def show_preview(self, path):
         """显示图片预览"""
-        self.scene.clear()
-        img = generate_thumbnail(path, max_size=1200)
-        self.current_preview_image = img
-        pix = pil_to_qpixmap(img)
-        self.base_item = QGraphicsPixmapItem(pix)
-        self.base_item.setZValue(0)
-        self.scene.addItem(self.base_item)
-
-        wm_pil = self.make_watermark_image_for_preview()
-        wm_pix = pil_to_qpixmap(wm_pil)
-        self.wm_item = QGraphicsPixmapItem(wm_pix)
-        self.wm_item.setFlags(QGraphicsPixmapItem.ItemIsMovable | QGraphicsPixmapItem.ItemIsSelectable)
-        self.wm_item.setZValue(1)
-        bw = pix.width(); bh = pix.height()
+        # 底图只按视口的实际像素解码，再缩放到预览坐标系显示；
+        # 坐标系本身固定为最长边 PREVIEW_SIZE，不随窗口大小变化
+        iw, ih = get_image_size(path)
+        self.preview_size = preview_size_for(iw, ih)
+        # 场景中的底图与水印项只创建一次,切换图片时原地替换 pixmap,不再清空并重建场景
+        if self.base_item is None:
+            self.base_item = QGraphicsPixmapItem()
+            self.base_item.setTransformationMode(Qt.SmoothTransformation)
+            self.base_item.setZValue(0)
+            self.scene.addItem(self.base_item)
+            self.wm_item = WatermarkItem(self)
+            self.wm_item.setTransformationMode(Qt.SmoothTransformation)  # 旋转后双线性过滤
+            self.wm_item.setFlags(QGraphicsPixmapItem.ItemIsMovable | QGraphicsPixmapItem.ItemIsSelectable)
+            self.wm_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges, self._pos_observer is not None)
+            self.wm_item.setZValue(1)
+            self.scene.addItem(self.wm_item)
+        self.render_preview_base(path)
+        self.scene.setSceneRect(QRectF(0, 0, *self.preview_size))
+
+        wm_pix = self.make_watermark_pixmap_for_preview()
+        self.wm_item.setPixmap(wm_pix)
+        self.apply_preview_rotation()
+        self.wm_item.setOpacity(self.preview_opacity()[1])
+        bw, bh = self.preview_size
         wmw = wm_pix.width(); wmh = wm_pix.height()
-        self.scene.addItem(self.wm_item)
         self.wm_item.setPos(bw - wmw - 20, bh - wmh - 20)
         self.on_pos_changed(self.pos_combo.currentIndex())
 
         self.view.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
 
-    def make_watermark_image_for_preview(self):
-        """生成预览用的水印图像"""
-        text = self.text_input.text()
-        font_size = self.fontsize_spin.value()
-        opacity = self.opacity_slider.value() / 100.0
-        color = self.font_color.getRgb()
-        bold = self.bold_cb.isChecked()
-        italic = self.italic_cb.isChecked()
+    def preview_watermark_key(self):
+        """
+        收集影响预览水印外观的全部参数
+
+        返回:
+            tuple: (text, font_path, font_size, color, opacity, bold, italic, shadow_blur)
+        """
         shadow_blur = self.show_blur_spin.value() if self.show_blur_spin.value() > 0 else 0
+        return (
+            self.text_input.text(),
+            self.font_path,
+            self.fontsize_spin.value(),
+            self.font_color.getRgb(),
+            self.preview_opacity()[0],
+            self.bold_cb.isChecked(),
+            self.italic_cb.isChecked(),
+            shadow_blur,
+        )
+
+    def viewport_render_px(self):
+        """
+        预览视口最长边对应的物理像素数
+
+        返回:
+            int: 底图需要解码到的最长边像素数
+        """
+        vp = self.view.viewport().size()
+        return max(256, int(max(vp.width(), vp.height()) * self.devicePixelRatioF()))
+
+    def render_preview_base(self, path):
+        """
+        按当前视口大小解码底图并设置到 base_item,缩放后占满预览坐标系
 
-        wm = create_text_watermark_image(
-            text=text,
+        参数:
+            path: 图片路径
+        """
+        render_px = min(max(self.preview_size), self.viewport_render_px())
+        self._preview_render_px = render_px
+        # 切回最近看过的图片时直接复用已解码的底图;文件被修改后修改时间变化,缓存自然失效
+        key = (path, os.stat(path).st_mtime_ns, render_px)
+        pix = self._preview_cache.get(key)
+        if pix is not None:
+            self._preview_cache.move_to_end(key)
+        else:
+            # 转换为 QPixmap 后不再保留 PIL 图像,缓存只占一份像素内存
+            pix = pil_to_qpixmap(generate_thumbnail(path, max_size=render_px))
+            self._preview_cache[key] = pix
+            if len(self._preview_cache) > 16:
+                self._preview_cache.popitem(last=False)
+        self.base_item.setPixmap(pix)
+        self.base_item.setScale(self.preview_size[0] / pix.width())
+
+    def closeEvent(self, event):
+        """关闭窗口时结束导出复用的进程池"""
+        # 从未导出过时 batch_worker 尚未导入,也就没有进程池需要关闭
+        batch_worker = sys.modules.get("core.batch_worker")
+        if batch_worker is not None:
+            batch_worker.shutdown_process_pool()
+        super().closeEvent(event)
+
+    def resizeEvent(self, event):
+        """窗口变大到上次渲染尺寸的 1.5 倍以上时重新生成底图,避免拖动窗口时反复解码"""
+        super().resizeEvent(event)
+        # 列表变高后可能露出新的行
+        self.request_visible_thumbnails()
+        if self.base_item is None or self.current_index is None:
+            return
+        if self._preview_render_px >= max(self.preview_size):
+            return
+        if self.viewport_render_px() > self._preview_render_px * 1.5:
+            # 只替换底图,水印位置保持不变
+            self.render_preview_base(self.image_paths[self.current_index])
+
+    def preview_opacity(self):
+        """
+        拆分预览水印的透明度
+        
+        无阴影且非粗体时,水印像素的 alpha 与透明度成正比,可以按不透明度 1 渲染,
+        再由图元的 setOpacity 调整,拖动透明度滑块时无需重新栅格化;
+        有阴影(阴影浓度不受透明度影响)或粗体(膨胀层叠加后 alpha 不再线性)时仍烘焙进水印图
+        
+        返回:
+            tuple: (渲染水印图时使用的不透明度, 预览图元的不透明度)
+        """
+        opacity = self.opacity_slider.value() / 100.0
+        if self.show_blur_spin.value() <= 0 and not self.bold_cb.isChecked():
+            return 1.0, opacity
+        return opacity, 1.0
+
+    def make_text_watermark(self, font_size, opacity):
+        """
+        按当前界面参数渲染未旋转的文字水印,预览与导出共用
+
+        文字渲染(字体排版 + 阴影模糊)按参数做 LRU 缓存,只调整位置或角度时不会重新栅格化;
+        导出字号与预览相同时直接命中预览渲染过的结果
+
+        参数:
+            font_size: 字号
+            opacity: 烘焙进水印图的不透明度
+
+        返回:
+            PIL.Image: RGBA 水印图(与缓存共享,不要原地修改)
+        """
+        from core.watermark import create_text_watermark_image_cached
+        shadow_blur = self.show_blur_spin.value() if self.show_blur_spin.value() > 0 else 0
+        return create_text_watermark_image_cached(
+            text=self.text_input.text(),
             font_path=self.font_path,
             font_size=font_size,
-            color=color,
+            color=self.font_color.getRgb(),
             opacity=opacity,
             stroke_width=0,
             stroke_fill=(0,0,0,255),
             shadow_blur=shadow_blur,
-            bold=bold,
-            italic=italic   
+            bold=self.bold_cb.isChecked(),
+            italic=self.italic_cb.isChecked()
         )
 
-        angle = self.rotate_spin.value()
-        if angle != 0:
-            wm = wm.rotate(angle, expand=True, resample=Image.BICUBIC)
-        
+    def make_watermark_image_for_preview(self):
+        """生成预览用的水印图像（参数未变化时直接返回上次的结果）"""
+        key = self.preview_watermark_key()
+        if key == self._wm_cache_key:
+            return self._wm_cache_img
+        cached = self._wm_preview_cache.get(key)
+        if cached is not None:
+            self._wm_preview_cache.move_to_end(key)
+            self._wm_cache_key = key
+            self._wm_cache_img = cached[0]
+            return cached[0]
+        # 预览水印不烘焙旋转,见 apply_preview_rotation
+        wm = self.make_text_watermark(key[2], key[4])
+
+        self._wm_preview_cache[key] = (wm, None)
+        if len(self._wm_preview_cache) > 8:
+            self._wm_preview_cache.popitem(last=False)
+        self._wm_cache_key = key
+        self._wm_cache_img = wm
         return wm
 
+    def make_watermark_pixmap_for_preview(self):
+        """
+        生成预览用的水印 QPixmap,与 PIL 水印图按同一参数键缓存
+
+        返回:
+            QPixmap: 当前参数对应的水印
+        """
+        wm_pil = self.make_watermark_image_for_preview()
+        key = self._wm_cache_key
+        pix = self._wm_preview_cache[key][1]
+        if pix is None:
+            pix = pil_to_qpixmap(wm_pil)
+            self._wm_preview_cache[key] = (wm_pil, pix)
+        return pix
+
+    def apply_preview_rotation(self):
+        """
+        用图元变换绕水印中心旋转预览水印
+
+        拖动角度滑块时只改变换矩阵,不重新栅格化、旋转和转换像素;
+        导出仍由 PIL 按 BICUBIC 旋转。PIL 的正角度为逆时针,Qt 为顺时针,因此取负值
+        """
+        pix = self.wm_item.pixmap()
+        self.wm_item.setTransformOriginPoint(pix.width() / 2, pix.height() / 2)
+        self.wm_item.setRotation(-self.rotate_spin.value())
+
     def update_preview_watermark(self):
+        """请求更新预览水印；拖动滑块等连续变化会合并为一次重绘"""
+        self._update_timer.start()
+
+    def _do_update_preview_watermark(self):
         """更新预览中的水印图像"""
         if not self.base_item or not self.wm_item:
             return
-        wm_pil = self.make_watermark_image_for_preview()
-        pix = pil_to_qpixmap(wm_pil)
-        self.wm_item.setPixmap(pix)
+        self.wm_item.setOpacity(self.preview_opacity()[1])
+        # 参数与当前显示的水印一致时无需重新生成和设置 pixmap
+        if self.preview_watermark_key() != self._wm_cache_key:
+            self.wm_item.setPixmap(self.make_watermark_pixmap_for_preview())
+        self.apply_preview_rotation()
 
     def on_pos_changed(self, idx):
         """处理位置选择变化"""
         if not self.base_item or not self.wm_item:
             return
-        base_rect = self.base_item.pixmap().rect()
-        w = base_rect.width(); h = base_rect.height()
-        wm_rect = self.wm_item.pixmap().rect()
-        positions = {
-            0: (10,10),
-            1: ((w-wm_rect.width())//2, 10),
-            2: (w-wm_rect.width()-10, 10),
-            3: (10, (h-wm_rect.height())//2),
-            4: ((w-wm_rect.width())//2, (h-wm_rect.height())//2),
-            5: (w-wm_rect.width()-10, (h-wm_rect.height())//2),
-            6: (10, h-wm_rect.height()-10),
-            7: ((w-wm_rect.width())//2, h-wm_rect.height()-10),
-            8: (w-wm_rect.width()-10, h-wm_rect.height()-10),
-        }
-        pos = positions.get(idx, (10,10))
-        self.wm_item.setPos(pos[0], pos[1])
+        w, h = self.preview_size
+        pix = self.wm_item.pixmap()
+        # 边距按旋转后的外接框计算
+        bbox = self.wm_item.mapRectToParent(self.wm_item.boundingRect())
+        wmw = bbox.width(); wmh = bbox.height()
+        # 九宫格: idx 的列/行分别为 idx%3 与 idx//3,每个方向取 靠前/居中/靠后 之一;
+        # 居中用浮点除法,尺寸为奇数时水印中心也恰好落在图片中心(导出锚点正好是 0.5)
+        if not 0 <= idx < 9:
+            idx = 0
+        x = (10, (w-wmw)/2, w-wmw-10)[idx % 3]
+        y = (10, (h-wmh)/2, h-wmh-10)[idx // 3]
+        # (x, y) 是外接框左上角;图元绕 pixmap 中心旋转,两者中心重合
+        self.wm_item.setPos(x + (wmw - pix.width()) / 2, y + (wmh - pix.height()) / 2)
 
     def select_output_dir(self):
         """选择输出文件夹"""
@@ -941,76 +1212,94 @@ class MainWindow(QWidget):
             self.output_dir_label.setText(d)
 
     def on_export(self):
-        """导出水印图片"""
+        """导出水印图片（列表中多选时导出全部选中的图片，否则导出当前图片）"""
         if self.current_index is None:
             QMessageBox.warning(self, "提示", "请先选择一张图片")
             return
         if not self.output_dir:
             QMessageBox.warning(self, "提示", "请选择输出文件夹")
             return
-        src = self.image_paths[self.current_index]
-        src_dir = str(Path(src).parent)
-        if os.path.abspath(src_dir) == os.path.abspath(self.output_dir):
-            QMessageBox.warning(self, "禁止", "默认禁止导出到原文件夹。请选择其他输出文件夹。")
-            return
-
-        orig = open_image_fix_orientation(src)
-        iw, ih = orig.size
-
-        base_pix = self.base_item.pixmap()
-        preview_w = base_pix.width(); preview_h = base_pix.height()
+        # 还有未执行的预览更新时先立即执行，保证下面读取的水印尺寸与当前参数一致
+        if self._update_timer.isActive():
+            self._update_timer.stop()
+            self._do_update_preview_watermark()
+        srcs = [item.data(Qt.UserRole) for item in self.list_widget.selectedItems()]
+        if not srcs:
+            srcs = [self.image_paths[self.current_index]]
+        out_dir = os.path.abspath(self.output_dir)
+        for src in srcs:
+            if os.path.abspath(str(Path(src).parent)) == out_dir:
+                QMessageBox.warning(self, "禁止", "默认禁止导出到原文件夹。请选择其他输出文件夹。")
+                return
+
+        preview_w, preview_h = self.preview_size
         wm_pix = self.wm_item.pixmap()
         wm_w = wm_pix.width(); wm_h = wm_pix.height()
         wm_pos = self.wm_item.pos()
+        # 预览水印绕 pixmap 中心旋转,旋转不改变中心位置
         center_x_preview = wm_pos.x() + wm_w/2
         center_y_preview = wm_pos.y() + wm_h/2
         anchor_x = center_x_preview / preview_w
         anchor_y = center_y_preview / preview_h
         anchor = (anchor_x, anchor_y)
 
-        scale_ratio = iw / preview_w
-        font_size = int(self.fontsize_spin.value() * scale_ratio)
-        if font_size < 8: font_size = 8
-
-        wm_pil_high = create_text_watermark_image(
-            text=self.text_input.text(),
-            font_path=self.font_path,
-            font_size=font_size,
-            color=self.font_color.getRgb(),
-            opacity=self.opacity_slider.value()/100.0,
-            stroke_width=0,
-            shadow_blur=self.show_blur_spin.value() if self.show_blur_spin.value() > 0 else 0,
-            bold=self.bold_cb.isChecked(),
-            italic=self.italic_cb.isChecked()
-        )
-
-        angle = self.rotate_spin.value()
-        if angle != 0:
-            wm_pil_high = wm_pil_high.rotate(angle, expand=True, resample=Image.BICUBIC)
-
         prefix = self.prefix_input.text() or ""
         suffix = self.suffix_input.text() or ""
         fmt = self.format_combo.currentText()
-        src_name = Path(src).stem
         src_ext = ".png" if fmt == "png" else ".jpg"
-        dst_name = f"{prefix}{src_name}{suffix}{src_ext}"
-        dst_path = os.path.join(self.output_dir, dst_name)
-        idx = 1
-        base_dst = dst_path
-        while os.path.exists(dst_path):
-            dst_path = os.path.join(self.output_dir, f"{prefix}{src_name}{suffix}_{idx}{src_ext}")
-            idx += 1
-
-        task = {
-            'src_path': src,
-            'dst_path': dst_path,
-            'watermark_img': wm_pil_high,
-            'anchor': anchor,
-            'output_format': fmt,
-            'jpeg_quality': 90
-        }
+        angle = self.rotate_spin.value()
+
+        # 水印按输出字号只渲染、旋转一次：同尺寸的图片共享同一个 Image 对象，
+        # batch_export 也只会把它序列化一次发给子进程；
+        # 水印参数不变时缓存跨多次导出保留，重复点击导出不会重新渲染
+        from core.watermark import rotate_watermark
+        shadow_blur = self.show_blur_spin.value() if self.show_blur_spin.value() > 0 else 0
+        export_key = (
+            self.text_input.text(), self.font_path, self.font_color.getRgb(),
+            self.opacity_slider.value()/100.0, shadow_blur,
+            self.bold_cb.isChecked(), self.italic_cb.isChecked(), angle,
+        )
+        if self._wm_export_cache[0] != export_key:
+            self._wm_export_cache = (export_key, {})
+        wm_by_font_size = self._wm_export_cache[1]
+        opacity = self.opacity_slider.value()/100.0
+        from core.batch_worker import SAVE_PRESETS, list_existing_names, ensure_output_path
+        save_options = SAVE_PRESETS['fast']
+        # 输出目录只列一次,之后在内存中查重;同一批次分配过的文件名也会加入集合,
+        # 不同文件夹下的同名图片不会互相覆盖
+        existing_names = list_existing_names(self.output_dir)
+        tasks = []
+        for src in srcs:
+            # 只读文件头取尺寸(已按 EXIF 方向交换宽高),真正的解码由导出进程完成
+            iw, ih = get_image_size(src)
+
+            # 字号以该图片自己的预览坐标系为准:多选导出时各图片尺寸不同,
+            # 不能沿用当前预览图片的 preview_w
+            scale_ratio = iw / preview_size_for(iw, ih)[0]
+            font_size = int(self.fontsize_spin.value() * scale_ratio)
+            if font_size < 8: font_size = 8
+
+            wm_pil_high = wm_by_font_size.get(font_size)
+            if wm_pil_high is None:
+                # 输出尺寸与预览坐标系一致(原图最长边不超过 PREVIEW_SIZE)时字号不变,
+                # 文字渲染直接命中预览的缓存;旋转按导出质量用 BICUBIC 重新做
+                wm_pil_high = rotate_watermark(self.make_text_watermark(font_size, opacity), angle)
+                wm_by_font_size[font_size] = wm_pil_high
+
+            dst_path = ensure_output_path(src, self.output_dir, prefix, suffix,
+                                          existing=existing_names, ext=src_ext)
+
+            tasks.append({
+                'src_path': src,
+                'dst_path': dst_path,
+                'watermark_img': wm_pil_high,
+                'anchor': anchor,
+                'output_format': fmt,
+                'jpeg_quality': 90,
+                **save_options
+            })
         self.export_btn.setEnabled(False)
-        self.worker = ExportWorker([task])
+        self.worker = ExportWorker(tasks)
         self.worker.progress.connect(self.on_export_progress)
         self.worker.finished_signal.connect(self.on_export_finished)
         self.worker.start()
@@ -1023,6 +1312,11 @@ class MainWindow(QWidget):
         QMessageBox.information(self, "导出完成", "图片导出完成。")
 
 if __name__ == "__main__":
+    # PyInstaller 打包后,进程池的子进程需要在这里接管执行
+    multiprocessing.freeze_support()
+    print(pillow_build_info())
+    if not is_pillow_simd():
+        print("提示: 当前使用标准 Pillow,安装 pillow-simd 可加速缩放/旋转/模糊(需 CPU 支持 SSE4/AVX2),见 README")
     app = QApplication(sys.argv)
     w = MainWindow()
     w.show()